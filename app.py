@@ -1,19 +1,25 @@
 import os
 import sys
-import uuid
-from flask import Flask, render_template, request, jsonify
+import atexit
+import tempfile
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from flask import Flask, Response, render_template, request, jsonify
+from flask.logging import default_handler
 
 # 确保能导入本地模块
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.pdf_downloader import PDFDownloader
-from core.pdf_parser import PDFParser
+from core.pdf_parser import PDFParser, warm_up_page_pool
 from core.benford_analyzer import BenfordAnalyzer
 from utils.excel_reader import ExcelReader
 
 app = Flask(__name__)
 
-# 初始化工具类
+# 初始化工具类 (年报链接数据延迟加载，服务入口处调用 excel_reader.load_in_background())
 excel_reader = ExcelReader()
 downloader = PDFDownloader(save_dir="temp_reports")
 parser = PDFParser()
@@ -60,9 +66,10 @@ def analyze():
             digit_position = int(request.form.get('digit_position', 1))
             numeral_system = request.form.get('numeral_system', 'decimal')
             
-            temp_filename = f"upload_{uuid.uuid4().hex}.pdf"
-            pdf_path = os.path.join("temp_reports", temp_filename)
-            file.save(pdf_path)
+            # 由 tempfile 原子地创建唯一文件并直接写入已打开的句柄；解析需要文件路径，分析结束后统一删除
+            with tempfile.NamedTemporaryFile(prefix="upload_", suffix=".pdf", dir="temp_reports", delete=False) as tmp:
+                pdf_path = tmp.name
+                file.save(tmp)
             
             stock_code = "MANUAL_UPLOAD"
             year = "N/A"
@@ -121,7 +128,11 @@ def analyze():
                 'raw_data': raw_records
             }
             
-            return jsonify({'success': True, 'data': result_data})
+            # 明细数据量大，使用 orjson 序列化 (比标准库 json 快数倍，并可直接处理 NumPy 类型)
+            return Response(
+                orjson.dumps({'success': True, 'data': result_data}, option=orjson.OPT_SERIALIZE_NUMPY),
+                mimetype='application/json'
+            )
 
         finally:
             if pdf_path and os.path.exists(pdf_path):
@@ -131,11 +142,27 @@ def analyze():
                     pass
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        app.logger.exception("analyze failed")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def configure_logging():
+    """日志经队列交给后台线程写出，请求线程不会阻塞在同步的 stderr 写入上"""
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s"))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(QueueHandler(log_queue))
+    app.logger.setLevel(logging.INFO)
+    return listener
+
 if __name__ == '__main__':
+    configure_logging()
+    excel_reader.load_in_background()
+    warm_up_page_pool()
     if not os.path.exists("temp_reports"):
         os.makedirs("temp_reports")
     
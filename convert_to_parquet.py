@@ -0,0 +1,26 @@
+import os
+import sys
+
+# 确保能导入本地模块
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.benford_analyzer import warm_up_jit
+from utils.excel_reader import DATA_FILES, CACHE_FILE, ExcelReader, convert_excel_to_parquet, parquet_path_for
+
+# 将年报链接 Excel 一次性转换为 Parquet 并生成合并索引缓存，加快服务启动 (用法: python convert_to_parquet.py [数据目录])
+if __name__ == '__main__':
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    for f in DATA_FILES:
+        path = os.path.join(data_dir, f)
+        if not f.endswith('.xlsx') or not os.path.exists(path):
+            continue
+        df = convert_excel_to_parquet(path)
+        print(f"✅ {path} -> {parquet_path_for(path)} ({len(df)} 行)")
+
+    # 构建一次 ExcelReader 以写入合并索引缓存
+    ExcelReader(data_dir=data_dir).ensure_loaded()
+    print(f"✅ 索引缓存 -> {os.path.join(data_dir, CACHE_FILE)}")
+
+    # 预先编译 Numba 数字统计函数并写入磁盘缓存，服务首次分析无需再编译
+    warm_up_jit()
+    print("✅ Numba 编译缓存")
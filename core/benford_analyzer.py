@@ -1,3 +1,4 @@
+import functools
 import math
 import pandas as pd
 import numpy as np
@@ -5,21 +6,77 @@ from typing import Dict, Tuple, List, Any
 from scipy import stats
 import re
 
+try:
+    from core.benford_jit import count_digits
+except ImportError:  # 未安装 Numba 时退回 NumPy 向量化实现
+    count_digits = None
+
+# 明细记录的字段 (列式存储：字段 -> 与样本一一对应的列表)
+RECORD_FIELDS = ('row_label', 'column_name', 'original_text', 'extracted_value', 'row_index')
+
+
+@functools.lru_cache(maxsize=32)
+def _critical_95(dof: int) -> float:
+    """95% 置信水平的卡方临界值 (ppf 需迭代求解；自由度取值很少，按自由度缓存)"""
+    return float(stats.chi2.ppf(0.95, dof))
+
+
+@functools.lru_cache(maxsize=32)
+def _power_table(base: int, max_exp: int) -> np.ndarray:
+    """精确的整数幂表 table[k] = float(base**k) (k = 0..max_exp，溢出记为 inf)，NumPy 与 Numba 实现共用"""
+    table = np.empty(max_exp + 1, dtype=np.float64)
+    for k in range(max_exp + 1):
+        try:
+            table[k] = float(base ** k)
+        except OverflowError:
+            table[k] = np.inf
+    table.setflags(write=False)  # 按参数缓存，禁止修改
+    return table
+
+
+def _max_shift(base: int, position: int) -> int:
+    """任意有限正 float64 缩放到第 position 位时可能用到的最大指数绝对值 (最小次正规数约为 2**-1075)"""
+    return int(1075 / math.log2(base)) + position + 3
+
+
+def _scale_by_power(x: np.ndarray, base: int, exponents: np.ndarray) -> np.ndarray:
+    """计算 x * base**exponents，幂次取自精确的整数幂表，负指数改用除法"""
+    powers = _power_table(base, int(np.abs(exponents).max()))[np.abs(exponents)]
+    scaled = x / powers
+    up = exponents >= 0
+    scaled[up] = x[up] * powers[up]
+    return scaled
+
+
+def warm_up_jit() -> None:
+    """以 analyze 相同的参数类型调用一次 Numba 函数，编译结果写入磁盘缓存 (构建镜像时调用，服务首次分析无需再编译)"""
+    if count_digits is None:
+        return
+    base = 10
+    count_digits(np.ones(1, dtype=np.float64), base, 1, _power_table(base, _max_shift(base, 1)), np.zeros(base, dtype=np.int64))
+
+
 class BenfordAnalyzer:
     def __init__(self):
         self._distribution_cache: Dict[Tuple[int, int], Dict[int, float]] = {}
+        # 预先计算所有支持的 进制 × 位数 组合，首个请求无需再计算理论分布
+        for base in (8, 10, 16):
+            for position in (1, 2, 3):
+                self._get_theoretical_distribution(base, position)
 
     def analyze(
         self,
         df: pd.DataFrame,
         digit_position: int = 1,
         numeral_system: str = 'decimal'
-    ) -> Tuple[Dict[str, float], float, Dict[str, int], str, Dict[str, Any], List[Dict]]:
+    ) -> Tuple[Dict[str, float], float, Dict[str, int], str, Dict[str, Any], Dict[str, List]]:
         
         base_map = {'decimal': 10, 'octal': 8, 'hexadecimal': 16}
         if numeral_system not in base_map:
             raise ValueError("不支持的进制体系")
         base = base_map[numeral_system]
+        if digit_position < 1:
+            raise ValueError("校验位数必须从 1 开始")
 
         numbers, records = self._extract_valid_numbers_with_details(df)
         
@@ -30,39 +87,45 @@ class BenfordAnalyzer:
         }
 
         if len(numbers) < 10:
-             return {}, 0.0, {}, "样本数量过少 (<10)，无法进行有效分析。", empty_metadata, []
+             return {}, 0.0, {}, "样本数量过少 (<10)，无法进行有效分析。", empty_metadata, self._empty_records()
 
         theoretical_dist = self._get_theoretical_distribution(base, digit_position)
-        
-        counts = {k: 0 for k in theoretical_dist.keys()}
-        valid_sample_count = 0
-        enriched_records = [] 
-        
-        for i, num in enumerate(numbers):
-            digit = self._get_digit_at_position(num, base, digit_position)
-            rec = records[i]
-            
-            if digit is not None and digit in counts:
-                counts[digit] += 1
-                valid_sample_count += 1
-                rec['extracted_digit'] = self._format_digit(digit, base)
-                enriched_records.append(rec)
-        
+
+        # 向量化提取指定位数字，-1 表示该数字无效 (非正数或首位为 0)
+        arr = np.asarray(numbers, dtype=np.float64)
+        if count_digits is not None:
+            counts_arr = np.zeros(base, dtype=np.int64)
+            powers = _power_table(base, _max_shift(base, digit_position))
+            digits = count_digits(arr, base, digit_position, powers, counts_arr)
+        else:
+            digits = self._get_digits_at_position(arr, base, digit_position)
+            counts_arr = np.bincount(digits[digits >= 0], minlength=base)
+        valid_idx = np.flatnonzero(digits >= 0)
+        valid_sample_count = int(valid_idx.size)
+
         if valid_sample_count == 0:
-            return {}, 0.0, {}, "未提取到有效位数的数字", empty_metadata, []
+            return {}, 0.0, {}, "未提取到有效位数的数字", empty_metadata, self._empty_records()
+
+        counts = {k: int(counts_arr[k]) for k in theoretical_dist.keys()}
+
+        # 列式记录：每个字段一个列表，只保留有效位数字对应的行
+        digit_labels = np.array([self._format_digit(d, base) for d in range(base)], dtype=object)
+        idx = valid_idx.tolist()
+        enriched_records = {key: [column[i] for i in idx] for key, column in records.items()}
+        enriched_records['extracted_digit'] = digit_labels[digits[valid_idx]].tolist()
 
         actual_dist = {k: v / valid_sample_count for k, v in counts.items()}
 
-        chi_square = 0.0
-        for d_int, prob in theoretical_dist.items():
-            obs = counts.get(d_int, 0)
-            exp = prob * valid_sample_count
-            if exp > 0:
-                chi_square += (obs - exp) ** 2 / exp
+        # 卡方统计量：按理论分布的数字顺序对齐观测频数与期望频数
+        digit_keys = np.fromiter(theoretical_dist.keys(), dtype=np.int64)
+        theo_arr = np.fromiter(theoretical_dist.values(), dtype=np.float64)
+        obs_arr = counts_arr[digit_keys]
+        exp_arr = theo_arr * valid_sample_count
+        chi_square = float(((obs_arr - exp_arr) ** 2 / np.where(exp_arr > 0, exp_arr, 1)).sum())
 
         degrees_of_freedom = len(theoretical_dist) - 1
         p_value = stats.chi2.sf(chi_square, degrees_of_freedom)
-        critical_value_95 = stats.chi2.ppf(0.95, degrees_of_freedom)
+        critical_value_95 = _critical_95(degrees_of_freedom)
 
         def fmt(d): return self._format_digit(d, base)
         
@@ -86,100 +149,130 @@ class BenfordAnalyzer:
 
         return final_actual_dist, chi_square, final_counts, conclusion, metadata, enriched_records
 
-    def _extract_valid_numbers_with_details(self, df: pd.DataFrame) -> Tuple[List[float], List[Dict]]:
+    @staticmethod
+    def _empty_records() -> Dict[str, List]:
+        """空的列式记录 (字段齐全，便于前端统一处理)"""
+        return {key: [] for key in RECORD_FIELDS + ('extracted_digit',)}
+
+    def _extract_valid_numbers_with_details(self, df: pd.DataFrame) -> Tuple[List[float], Dict[str, List]]:
         """
         提取数字并记录来源详情
         【升级】：增加 row_label (项目名称) 的提取
+        【优化】：逐列使用 pandas/NumPy 向量化完成匹配、转换与过滤
+        【优化】：记录按列存储 (字段 -> 列表)，整列追加，JSON 中不再为每条记录重复键名
         """
-        values = []
-        records = []
+        records = {key: [] for key in RECORD_FIELDS}
+        values = records['extracted_value']
         
         ignore_keywords = ['附注', 'note', '注释', '行次'] # 移除了 '项目'，因为我们要用它
         number_pattern = re.compile(r'^-?\d+(\.\d+)?$')
 
         # --- 1. 寻找“项目名称”列 ---
         # 逻辑：优先找包含 "项目"、"Item" 的列，如果找不到，就默认第一列是标签列
-        label_col = None
-        for col in df.columns:
+        label_pos = None
+        for pos, col in enumerate(df.columns):
             c_str = str(col).lower()
             if '项目' in c_str or 'item' in c_str:
-                label_col = col
+                label_pos = pos
                 break
         
-        if label_col is None and len(df.columns) > 0:
-            label_col = df.columns[0] # 降级策略：默认第一列
-
-        # --- 内部函数：智能日期判断 ---
-        def is_date_like(val_float: float) -> bool:
-            if not val_float.is_integer(): return False
-            s = str(int(val_float))
-            if len(s) != 8: return False
-            year = int(s[0:4])
-            if not (1990 <= year <= 2030): return False
-            month = int(s[4:6])
-            if not (1 <= month <= 12): return False
-            day = int(s[6:8])
-            if not (1 <= day <= 31): return False
-            return True
-
-        for col in df.columns:
+        if label_pos is None and len(df.columns) > 0:
+            label_pos = 0 # 降级策略：默认第一列
+        row_index_values = np.empty(len(df), dtype=object)
+        row_index_values[:] = df.index.tolist()
+
+        # 预先计算整列“项目名称”文本，按行位置直接取值，避免逐条记录做标签查找与清理
+        label_texts = np.full(len(df), "N/A", dtype=object)
+        if label_pos is not None:
+            label_column = df.iloc[:, label_pos]
+            present = label_column.notna().to_numpy()
+            label_texts[present] = (
+                label_column[present].astype(str).astype(object)
+                .str.strip().str.replace('\n', ' ', regex=False).to_numpy()
+            )
+
+        # --- 内部函数：向量化过滤零值、年份与日期 ---
+        def is_valid_value(vals: np.ndarray) -> np.ndarray:
+            is_int = vals == np.floor(vals)
+            is_year = is_int & (vals >= 1990) & (vals <= 2030)
+
+            # 智能日期判断：8 位整数且可拆成合法的 年(1990-2030)/月/日
+            date_candidate = is_int & (vals >= 1e7) & (vals < 1e8)
+            ints = np.where(date_candidate, vals, 0).astype(np.int64)
+            year, month, day = ints // 10000, ints // 100 % 100, ints % 100
+            is_date = (date_candidate & (year >= 1990) & (year <= 2030)
+                       & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31))
+
+            return (vals != 0) & ~is_year & ~is_date
+
+        for col_pos, col in enumerate(df.columns):
             col_clean = str(col).lower().replace(' ', '').replace('\n', '')
             if not col_clean: continue
             
             # 如果这一列就是“项目名称”列，或者是忽略列，跳过
-            if col == label_col: continue 
+            if col_pos == label_pos: continue 
             if any(keyword in col_clean for keyword in ignore_keywords): continue
 
-            for idx, item in df[col].items():
-                if pd.isna(item): continue
-                
-                s = str(item).strip().replace(',', '')
-                
-                if number_pattern.fullmatch(s):
-                    try:
-                        val = float(s)
-                        if val == 0: continue
-                        if val.is_integer() and 1990 <= val <= 2030: continue
-                        if is_date_like(val): continue
-                        
-                        val_abs = abs(val)
-                        values.append(val_abs)
-                        
-                        # --- 获取当前行的“项目名称” ---
-                        row_label_text = "N/A"
-                        if label_col is not None:
-                            try:
-                                # 获取标签列在当前行 (idx) 的值
-                                label_val = df.at[idx, label_col]
-                                if pd.notna(label_val):
-                                    row_label_text = str(label_val).strip().replace('\n', ' ')
-                            except:
-                                pass
-
-                        records.append({
-                            'row_label': row_label_text, # 新增：项目名称 (如 "货币资金")
-                            'column_name': str(col),     # 列名 (如 "2023年12月31日")
-                            'original_text': str(item),
-                            'extracted_value': val_abs,
-                            'row_index': idx
-                        })
-                    except ValueError:
-                        continue
+            column = df.iloc[:, col_pos]
+            rows = np.flatnonzero(column.notna().to_numpy())
+            if rows.size == 0: continue
+
+            original_text = column.iloc[rows].astype(str).astype(object)
+            cleaned = original_text.str.strip().str.replace(',', '', regex=False)
+            matched = cleaned.str.fullmatch(number_pattern).to_numpy(dtype=bool)
+            if not matched.any(): continue
+
+            vals = cleaned[matched].astype(np.float64).to_numpy()
+            keep = is_valid_value(vals)
+            rows = rows[matched][keep]
+            original_text = original_text.to_numpy()[matched][keep]
+            vals_abs = np.abs(vals[keep])
+
+            records['row_label'].extend(label_texts[rows].tolist())      # 项目名称 (如 "货币资金")
+            records['column_name'].extend([str(col)] * rows.size)         # 列名 (如 "2023年12月31日")
+            records['original_text'].extend(original_text.tolist())
+            records['extracted_value'].extend(vals_abs.tolist())
+            records['row_index'].extend(row_index_values[rows].tolist())
                         
         return values, records
 
-    # ... (其余方法保持不变: _get_digit_at_position, _get_theoretical_distribution, _format_digit, _generate_dynamic_conclusion) ...
-    def _get_digit_at_position(self, num: float, base: int, position: int) -> int | None:
-        if num <= 0: return None
-        try:
-            log_val = math.log(num, base)
-            decimal_part = log_val - math.floor(log_val)
-            normalized = base ** decimal_part
-            shifted = normalized * (base ** (position - 1))
-            digit = int(shifted) % base
-            if position == 1 and digit == 0: return None
-            return digit
-        except: return None
+    # ... (其余方法保持不变: _get_theoretical_distribution, _format_digit, _generate_dynamic_conclusion) ...
+    def _get_digits_at_position(self, nums: np.ndarray, base: int, position: int) -> np.ndarray:
+        """
+        批量计算每个数字在指定进制下第 position 位的数字
+
+        对数只用于估计数量级，随后用精确的进制幂次缩放并修正估计误差，
+        避免 1000、0x60 这类整数在浮点对数边界上被取错位。
+
+        Returns:
+            与 nums 等长的 int64 数组，无效位置 (非正数/非有限值/首位为 0) 记为 -1
+        """
+        digits = np.full(nums.shape, -1, dtype=np.int64)
+        mask = np.isfinite(nums) & (nums > 0)
+        if not mask.any():
+            return digits
+
+        x = nums[mask]
+        lower = float(base ** (position - 1))
+        upper = float(base ** position)
+
+        # 缩放到 [base^(position-1), base^position) 区间，整数部分的末位即所求数字
+        shift = (position - 1) - np.floor(np.log(x) / math.log(base)).astype(np.int64)
+        shifted = _scale_by_power(x, base, shift)
+        shift += (shifted < lower).astype(np.int64) - (shifted >= upper).astype(np.int64)
+        shifted = _scale_by_power(x, base, shift)
+
+        # 次正规数等极端值缩放后会溢出，视为无效
+        finite = np.isfinite(shifted)
+        valid_digits = np.full(x.shape, -1, dtype=np.int64)
+
+        # 容忍几个 ulp 的乘法舍入误差 (如 0.57 * 100 = 56.99999999999999)
+        scaled = shifted[finite] * (1 + 8 * np.finfo(np.float64).eps)
+        valid_digits[finite] = scaled.astype(np.int64) % base
+        if position == 1:
+            valid_digits[valid_digits == 0] = -1
+        digits[mask] = valid_digits
+        return digits
 
     def _get_theoretical_distribution(self, base: int, position: int) -> Dict[int, float]:
         cache_key = (base, position)
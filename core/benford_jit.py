@@ -0,0 +1,59 @@
+import math
+import numpy as np
+from numba import njit
+
+# 容忍几个 ulp 的乘法舍入误差，与 BenfordAnalyzer._get_digits_at_position 保持一致
+_ROUNDING_SLACK = 1 + 8 * np.finfo(np.float64).eps
+
+
+@njit(cache=True)
+def _scale_by_power(x: float, powers: np.ndarray, exponent: int) -> float:
+    """计算 x * base**exponent，幂次取自精确的整数幂表 powers (超出表长视为溢出)，负指数改用除法"""
+    k = abs(exponent)
+    power = powers[k] if k < powers.size else math.inf
+    if exponent >= 0:
+        return x * power
+    return x / power
+
+
+@njit(cache=True)
+def count_digits(arr: np.ndarray, base: int, position: int, powers: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    统计每个数字在指定进制下第 position 位的数字
+
+    Args:
+        arr: float64 数组
+        base: 进制
+        position: 校验位 (1 为首位)
+        powers: 精确的整数幂表 powers[k] = float(base**k)，与 NumPy 实现使用同一张表
+        out: 预分配的 int64 计数数组 (长度为 base)，按数字累加频数
+
+    Returns:
+        与 arr 等长的 int64 数组，无效位置 (非正数/非有限值/首位为 0) 记为 -1
+    """
+    digits = np.full(arr.size, -1, dtype=np.int64)
+    lower = powers[position - 1]
+    upper = powers[position]
+    log_base = math.log(base)
+
+    for i in range(arr.size):
+        x = arr[i]
+        if not (x > 0) or math.isinf(x):
+            continue
+
+        shift = (position - 1) - int(math.floor(math.log(x) / log_base))
+        shifted = _scale_by_power(x, powers, shift)
+        if shifted < lower:
+            shifted = _scale_by_power(x, powers, shift + 1)
+        elif shifted >= upper:
+            shifted = _scale_by_power(x, powers, shift - 1)
+        if math.isinf(shifted):
+            continue
+
+        digit = int(shifted * _ROUNDING_SLACK) % base
+        if position == 1 and digit == 0:
+            continue
+        digits[i] = digit
+        out[digit] += 1
+
+    return digits
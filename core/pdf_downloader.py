@@ -1,12 +1,21 @@
 import requests
 import os
+import shutil
 from typing import Optional
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 
 class PDFDownloader:
     def __init__(self, save_dir: str = "reports"):
         self.save_dir = save_dir
         Path(save_dir).mkdir(exist_ok=True)
+
+        # 复用连接 (keep-alive)，避免每次下载都重新建立 TCP/TLS 连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
     
     def download_pdf(self, url: str, stock_code: str, year: int) -> Optional[str]:
         """
@@ -25,18 +34,15 @@ class PDFDownloader:
             filename = f"{stock_code}_{year}_annual_report.pdf"
             save_path = os.path.join(self.save_dir, filename)
             
-            # 下载文件
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # 保存文件
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # 下载文件并以 1 MiB 为单位直接写入磁盘
+            with self.session.get(url, stream=True, timeout=(5, 60)) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with open(save_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1 << 20)
             
             return save_path
             
         except Exception as e:
             print(f"下载失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
@@ -1,13 +1,106 @@
 import pdfplumber
+import pymupdf
 import pandas as pd
 from typing import List, Tuple, Any, Optional
+import os
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import warnings
+from utils.process_pool import MP_CONTEXT, pool_workers
 # 忽略PDF解析警告
 warnings.filterwarnings("ignore")
 
+
+# 子进程内已打开的 PDF：key 为 (路径, 大小, 修改时间)，同一请求的各页任务复用；只保留最近几个文件
+_WORKER_PDF_CACHE_SIZE = 2
+_worker_pdfs: "OrderedDict[Tuple[str, int, int], Any]" = OrderedDict()
+
+# 常驻进程池 (每个服务进程一个，首次需要时创建，各请求共用)
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def _open_worker_pdf(pdf_path: str) -> Any:
+    """子进程内按路径缓存打开的 PDF (文件被替换后大小/修改时间变化，会重新打开)"""
+    st = os.stat(pdf_path)
+    key = (pdf_path, st.st_size, st.st_mtime_ns)
+    pdf = _worker_pdfs.get(key)
+    if pdf is not None:
+        _worker_pdfs.move_to_end(key)
+        return pdf
+    pdf = pdfplumber.open(Path(pdf_path))
+    _worker_pdfs[key] = pdf
+    while len(_worker_pdfs) > _WORKER_PDF_CACHE_SIZE:
+        _, old = _worker_pdfs.popitem(last=False)
+        old.close()
+    return pdf
+
+
+def _extract_page_tables(task: Tuple[str, int]) -> List[List[str]]:
+    """子进程入口：提取 (pdf_path, page_index) 指定页的表格行 (需为模块级函数以便 pickle)"""
+    pdf_path, page_index = task
+    page = _open_worker_pdf(pdf_path).pages[page_index]
+    try:
+        return PDFParser()._extract_page_rows(page)
+    finally:
+        page.close()  # 释放该页的字符/版面缓存，子进程会依次处理多页
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """返回常驻进程池，不存在时创建 (子进程启动与导入只发生一次)"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=pool_workers(os.cpu_count() or 1),
+                mp_context=MP_CONTEXT,
+            )
+        return _page_pool
+
+
+def warm_up_page_pool() -> Optional[threading.Thread]:
+    """
+    服务启动时在后台线程中预先拉起常驻进程池的子进程，首个请求无需等待
+
+    子进程启动时会重新导入主模块 (python app.py 时即整个应用，耗时数秒)。
+    分到的 CPU 只有一个、不会使用进程池时不做任何事，返回 None。
+    """
+    max_workers = pool_workers(os.cpu_count() or 1)
+    if max_workers <= 1:
+        return None
+
+    def start_workers() -> None:
+        pool = _get_page_pool()
+        for future in [pool.submit(os.getpid) for _ in range(max_workers)]:
+            future.result()
+
+    thread = threading.Thread(target=start_workers, daemon=True)
+    thread.start()
+    return thread
+
+
+def _discard_page_pool(pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池 (如子进程被杀)，下次使用时重新创建"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
 class PDFParser:
+    # 页码区间不超过该页数时不启用多进程
+    parallel_min_pages = 2
+
+    # 单元格清理与数值转换使用的正则 (预编译，避免在逐单元格的热路径上反复查找缓存)
+    _CLEAN_RE = re.compile(r'[^\w\s\u4e00-\u9fff\-\.]')
+    _WS_RE = re.compile(r'\s+')
+    _NUM_RE = re.compile(r'[^\d\-\.]')
+
     def __init__(self):
         self.table_start_markers = [
             "合并资产负债表",
@@ -19,13 +112,61 @@ class PDFParser:
             "母公司所有者权益变动表"
         ]
         
-    def find_page_range(self, pdf: Any, start_keyword: str, end_keyword: str) -> Tuple[int | None, int | None]:
-        """查找起止关键词所在页码区间（起始包含，终止不包含）"""
+    def find_page_range(self, doc: Any, start_keyword: str, end_keyword: str) -> Tuple[int | None, int | None]:
+        """
+        查找起止关键词所在页码区间（起始包含，终止不包含）
+
+        doc 为 PyMuPDF 文档：只需纯文本定位页码，MuPDF 提取文本远快于 pdfminer。
+        优先使用 PDF 书签目录直接定位；没有可用书签时从文档后半部分开始扫描
+        （财务报表通常位于年报后半部分，命中后向前回溯跨越中点的续页），仍未找到再从头扫描。
+        """
+        page_texts = {}
+
+        def page_text(i: int) -> str:
+            if i not in page_texts:
+                page_texts[i] = doc.load_page(i).get_text("text") or ""
+            return page_texts[i]
+
+        start_page, end_page = self._find_range_by_toc(doc, start_keyword, end_keyword, page_text)
+        if start_page is None or end_page is None:
+            middle = doc.page_count // 2
+            start_page, end_page = self._scan_page_range(doc, start_keyword, end_keyword, page_text, middle)
+            # 报表可能跨越中点（续页同样含起始关键词）：向前回溯到真正的起始页，回溯到中点时改为从头扫描
+            while start_page is not None and start_page > middle and start_keyword in page_text(start_page - 1):
+                start_page -= 1
+            if start_page == middle and middle > 0 and start_keyword in page_text(middle - 1):
+                start_page, end_page = None, None
+        if start_page is None or end_page is None:
+            start_page, end_page = self._scan_page_range(doc, start_keyword, end_keyword, page_text, 0)
+        print("start_page", start_page, "end_page", end_page)
+        return start_page, end_page
+
+    def _find_range_by_toc(self, doc: Any, start_keyword: str, end_keyword: str, page_text: Any) -> Tuple[int | None, int | None]:
+        """根据书签目录定位区间，书签指向的页面需确实包含关键词"""
+        start_page: int | None = None
+        end_page: int | None = None
+        for _, title, page in doc.get_toc():
+            if page < 1:
+                continue
+            if start_page is None and start_keyword in title:
+                start_page = page - 1
+            elif start_page is not None and end_keyword in title and page - 1 > start_page:
+                end_page = page - 1
+                break
+
+        if start_page is None or end_page is None:
+            return None, None
+        if start_keyword not in page_text(start_page) or end_keyword not in page_text(end_page):
+            return None, None
+        return start_page, end_page
+
+    def _scan_page_range(self, doc: Any, start_keyword: str, end_keyword: str, page_text: Any, first_page: int) -> Tuple[int | None, int | None]:
+        """从 first_page 开始逐页扫描文本定位区间"""
         pre_page: int | None = None
         start_page: int | None = None
         end_page: int | None = None
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text() or ""
+        for i in range(first_page, doc.page_count):
+            text = page_text(i)
             if pre_page is None and "财务报表" in text:
                 pre_page = i
             if pre_page is not None and start_page is None and start_keyword in text and ("财务报表" in text or "项目" in text):
@@ -34,60 +175,33 @@ class PDFParser:
             if start_page is not None and end_keyword in text:
                 end_page = i
                 break
-        print("start_page", start_page, "end_page", end_page)
         return start_page, end_page
 
     def extract_tables(self, pdf_path: str) -> pd.DataFrame:
         """提取PDF中指定页码区间内的所有表格并合并"""
         all_data = []
-        with pdfplumber.open(Path(pdf_path)) as pdf:
-            start_page, end_page = self.find_page_range(pdf, "合并资产负债表", "合并所有者权益变动表")
-            if start_page is None or end_page is None:
-                print("未找到指定区间！")
-                return pd.DataFrame()
-                
-            for i in range(start_page, end_page):
-                page = pdf.pages[i]
-                for table in page.extract_tables():
-                    if table and len(table) > 1:  # 确保表格至少包含表头和一行数据           
-                        
-                        # 如果列数为9列，处理表格
-                        # 修复表头，将“期末余额”和“期初余额”左移一列
-                        header = table[0]
-                        if len(header) == 9:
-                            header_fixed = header[:]
-                            header_fixed[3] = header_fixed[4]
-                            header_fixed[4] = ''
-                            header_fixed[6] = header_fixed[7]
-                            header_fixed[7] = ''
-                            # for i in range(1, len(header)):
-                            #     if header[i] == '期末余额':
-                            #         header_fixed[i-1] = '期末余额'
-                            #         header_fixed[i] = ''
-                            #     elif header[i] == '期初余额':
-                            #         header_fixed[i-1] = '期初余额'
-                            #         header_fixed[i] = ''
-                            table[0] = header_fixed
-                        
-                        # 清理表格数据
-                        cleaned_table = []
-                        for row in table:
-                            cleaned_row = [self._clean_cell(cell) for cell in row]
-                            if any(cleaned_row):  # 只保留非空行
-                                cleaned_table.append(cleaned_row)
-                        
-                        if len(cleaned_table) > 1:  # 确保清理后仍然有数据
-                            # 检查列数是否一致
-                            if not all(len(row) == len(cleaned_table[0]) for row in cleaned_table):
-                                # 如果列数不一致，取最长的行作为标准
-                                max_cols = max(len(row) for row in cleaned_table)
-                                # 对每行进行填充或截断
-                                cleaned_table = [
-                                    row + [''] * (max_cols - len(row)) if len(row) < max_cols
-                                    else row[:max_cols]
-                                    for row in cleaned_table
-                                ]
-                            all_data.extend(cleaned_table)
+        with pymupdf.open(pdf_path) as doc:
+            start_page, end_page = self.find_page_range(doc, "合并资产负债表", "合并所有者权益变动表")
+        if start_page is None or end_page is None:
+            print("未找到指定区间！")
+            return pd.DataFrame()
+
+        # 页数较少或分到的 CPU 只有一个时多进程的启动开销得不偿失，直接顺序提取
+        # pdfplumber 只用于区间内页面的表格提取，且只加载这些页面
+        page_indices = list(range(start_page, end_page))
+        max_workers = pool_workers(len(page_indices))
+        if max_workers <= 1 or len(page_indices) <= self.parallel_min_pages:
+            all_data = self._extract_rows_sequential(pdf_path, page_indices)
+        else:
+            # pdfminer 存在全局状态，不适合多线程；按页分发到常驻进程池并保持页序合并
+            pool = _get_page_pool()
+            try:
+                for rows in pool.map(_extract_page_tables, [(pdf_path, i) for i in page_indices]):
+                    all_data.extend(rows)
+            except BrokenProcessPool as e:
+                print(f"进程池异常，改为顺序提取: {e}")
+                _discard_page_pool(pool)
+                all_data = self._extract_rows_sequential(pdf_path, page_indices)
         
         if not all_data:
             return pd.DataFrame()
@@ -128,6 +242,60 @@ class PDFParser:
             print(f"创建DataFrame时出错: {str(e)}")
             return pd.DataFrame()
     
+    def _extract_rows_sequential(self, pdf_path: str, page_indices: List[int]) -> List[List[str]]:
+        """在当前进程中逐页提取表格行 (pdfplumber 只加载区间内的页面)"""
+        all_data = []
+        with pdfplumber.open(Path(pdf_path), pages=[i + 1 for i in page_indices]) as pdf:
+            for page in pdf.pages:
+                all_data.extend(self._extract_page_rows(page))
+                page.close()
+        return all_data
+
+    def _extract_page_rows(self, page: Any) -> List[List[str]]:
+        """提取单页中的所有表格，返回清理并对齐列数后的行"""
+        page_rows = []
+        for table in page.extract_tables():
+            if table and len(table) > 1:  # 确保表格至少包含表头和一行数据           
+                
+                # 如果列数为9列，处理表格
+                # 修复表头，将“期末余额”和“期初余额”左移一列
+                header = table[0]
+                if len(header) == 9:
+                    header_fixed = header[:]
+                    header_fixed[3] = header_fixed[4]
+                    header_fixed[4] = ''
+                    header_fixed[6] = header_fixed[7]
+                    header_fixed[7] = ''
+                    # for i in range(1, len(header)):
+                    #     if header[i] == '期末余额':
+                    #         header_fixed[i-1] = '期末余额'
+                    #         header_fixed[i] = ''
+                    #     elif header[i] == '期初余额':
+                    #         header_fixed[i-1] = '期初余额'
+                    #         header_fixed[i] = ''
+                    table[0] = header_fixed
+                
+                # 清理表格数据
+                cleaned_table = []
+                for row in table:
+                    cleaned_row = [self._clean_cell(cell) for cell in row]
+                    if any(cleaned_row):  # 只保留非空行
+                        cleaned_table.append(cleaned_row)
+                
+                if len(cleaned_table) > 1:  # 确保清理后仍然有数据
+                    # 检查列数是否一致
+                    if not all(len(row) == len(cleaned_table[0]) for row in cleaned_table):
+                        # 如果列数不一致，取最长的行作为标准
+                        max_cols = max(len(row) for row in cleaned_table)
+                        # 对每行进行填充或截断
+                        cleaned_table = [
+                            row + [''] * (max_cols - len(row)) if len(row) < max_cols
+                            else row[:max_cols]
+                            for row in cleaned_table
+                        ]
+                    page_rows.extend(cleaned_table)
+        return page_rows
+
     def _clean_cell(self, cell: Optional[str]) -> str:
         """
         清理单元格数据
@@ -142,8 +310,8 @@ class PDFParser:
             return ""
         
         # 移除特殊字符和多余空格
-        cell = re.sub(r'[^\w\s\u4e00-\u9fff\-\.]', '', str(cell))
-        cell = re.sub(r'\s+', ' ', cell).strip()
+        cell = self._CLEAN_RE.sub('', str(cell))
+        cell = self._WS_RE.sub(' ', cell).strip()
         
         return cell
     
@@ -161,7 +329,7 @@ class PDFParser:
             return 0.0
             
         # 移除所有非数字字符（保留小数点和负号）
-        value = re.sub(r'[^\d\-\.]', '', str(value))
+        value = self._NUM_RE.sub('', str(value))
         
         try:
             return float(value)
@@ -0,0 +1,17 @@
+import os
+
+# gunicorn 配置 (gunicorn -c gunicorn.conf.py wsgi:app)
+# 多进程 + 每进程多线程：PDF 下载 (IO) 可与其他请求的解析 (CPU) 重叠进行
+# 均可通过环境变量调整:
+#   WEB_CONCURRENCY   工作进程数
+#   GUNICORN_THREADS  每个进程的线程数
+#   GUNICORN_TIMEOUT  单个请求超时秒数 (大型年报解析较慢，默认放宽到 300 秒)
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+
+# 写回实际值，工作进程 (继承环境变量) 据此计算 PDF 解析进程池大小，见 utils/process_pool.py
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
@@ -1,99 +1,450 @@
 import pandas as pd
+import numpy as np
 import os
+import re
+import bisect
+import pickle
+import hashlib
+import functools
+import threading
+import importlib.util
+import openpyxl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from collections import defaultdict
 
+# 数据源文件 (按读取顺序)
+DATA_FILES = [
+    "2001-2020.xlsx", "2021-2024.xlsx",
+    "2001-2020.xlsx - Sheet1.csv", "2021-2024.xlsx - Sheet1.csv"
+]
+
+# 数据集名：去掉扩展名以及 CSV 导出时附加的 ".xlsx - Sheet1" (如 "2001-2020.xlsx - Sheet1.csv" -> "2001-2020")
+_DATASET_STEM_RE = re.compile(r'(\.xlsx - [^.]*)?\.(xlsx|csv|parquet)$')
+
+# CSV 中视为缺失值的字符串 (与 pandas.read_csv 默认的 na_values 一致)
+_CSV_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+# 字段内允许出现换行 (带引号的多行单元格)，与 pandas 解析结果一致
+_CSV_PARSE_OPTIONS = pa_csv.ParseOptions(newlines_in_values=True)
+
+# 合并后的索引缓存 (stock_map / stock_years / stock_db)，数据文件未变化时启动直接加载
+CACHE_FILE = "_excel_reader_cache.pkl"
+# 缓存内容的结构版本，结构变化时递增以使旧缓存失效
+_CACHE_VERSION = 7
+# 单数据集解析结果缓存目录 (位于数据目录下)：合并缓存失效时，只有内容变化的数据集需要重新解析
+DATASET_CACHE_DIR = ".excel_reader_cache"
+# 单数据集缓存文件名 (32 位十六进制指纹)，清理旧缓存时只删除符合该格式的文件
+_DATASET_CACHE_RE = re.compile(r'[0-9a-f]{32}\.pkl')
+# 数据集指纹读取每个候选文件开头的字节数
+_FINGERPRINT_BYTES = 64 * 1024
+
+# 可无损转为 int 的年份字符串 (str(int(y)) == y)，其余年份按原字符串保存
+_INT_YEAR_RE = re.compile(r'0|-?[1-9][0-9]*')
+
+# Excel 解析引擎：优先使用 Rust 实现的 calamine，未安装时回退到 openpyxl 流式读取
+_EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+# openpyxl 流式读取时每批组装 DataFrame 的行数
+_EXCEL_CHUNK_ROWS = 10000
+_NULL_TEXTS = frozenset(_CSV_NULL_VALUES)
+
+
+def parquet_path_for(excel_path):
+    """Excel 文件对应的 Parquet 旁路文件路径 (同目录同名，扩展名为 .parquet)"""
+    return os.path.splitext(excel_path)[0] + ".parquet"
+
+
+def _atomic_write(path, write_fn):
+    """
+    先写临时文件再替换为 path：多个工作进程同时启动时，其他进程不会读到写了一半的文件
+
+    write_fn 接收以二进制写方式打开的临时文件；写入失败时删除临时文件并重新抛出异常
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def convert_excel_to_parquet(excel_path):
+    """
+    读取 Excel 并将识别出的列写入同名 Parquet 旁路文件
+
+    Returns:
+        只包含所需列的 DataFrame (写入失败时仍返回读取结果)
+    """
+    if _EXCEL_ENGINE == "calamine":
+        df = pd.read_excel(excel_path, engine=_EXCEL_ENGINE, dtype=str)
+        df.columns = [str(c).strip() for c in df.columns]
+        wanted = list(ExcelReader._map_columns(df.columns).values()) or list(df.columns)
+        df = df[wanted]
+    else:
+        df = read_excel_streaming(excel_path)
+
+    try:
+        _atomic_write(parquet_path_for(excel_path), lambda f: df.to_parquet(f, index=False))
+    except Exception as e:
+        print(f"写入 Parquet 缓存失败 {excel_path}: {e}")
+    return df
+
+
+def _excel_cell_text(value):
+    """单元格值转字符串，规则同 pd.read_excel(dtype=str)：整数值的浮点数按整数输出，空值/缺失标记为 None"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value)
+    return None if text in _NULL_TEXTS else text
+
+
+def read_excel_streaming(excel_path):
+    """
+    使用 openpyxl 只读模式逐行流式读取第一个工作表中识别出的列
+
+    只读模式按 SAX 方式解析 XML，不构建整表单元格对象；每 _EXCEL_CHUNK_ROWS 行组装一次 DataFrame。
+    与 pd.read_excel(dtype=str) 一致：首行为表头，中间空行保留，末尾空行丢弃。
+    """
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = [f"Unnamed: {i}" if c is None else str(c).strip() for i, c in enumerate(header)]
+
+        # 同名列以最后一列为准 (与 _map_columns 的覆盖顺序一致)
+        col_map = ExcelReader._map_columns(columns)
+        wanted = set(col_map.values())
+        last_pos = {c: i for i, c in enumerate(columns) if c in wanted}
+        positions = sorted(last_pos.values()) if last_pos else list(range(len(columns)))
+        names = [columns[i] for i in positions]
+
+        chunks, buffer, pending_blank = [], [], 0
+        for row in rows:
+            if all(v is None or v == '' for v in row):
+                pending_blank += 1  # 暂不写入，只有后面还有数据时才保留
+                continue
+            buffer.extend([(None,) * len(positions)] * pending_blank)
+            pending_blank = 0
+            buffer.append(tuple(_excel_cell_text(row[i]) if i < len(row) else None for i in positions))
+            if len(buffer) >= _EXCEL_CHUNK_ROWS:
+                chunks.append(pd.DataFrame.from_records(buffer, columns=names))
+                buffer = []
+        if buffer or not chunks:
+            chunks.append(pd.DataFrame.from_records(buffer, columns=names))
+    finally:
+        wb.close()
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+class StockTable:
+    """
+    搜索用股票信息的列式存储 (每个字段一个数组，下标即股票编号)
+
+    codes / names 为定长 Unicode 数组，aliases 为简称元组的 object 数组；
+    另外预存小写名称与 "\\x1f" 拼接的小写简称，子串匹配无需逐次 lower()。
+    子串校验使用连续的 UTF-8 字节串 blob (每只股票一段：代码、小写名称、小写简称以 "\\x1f" 分隔)
+    与各段起始偏移 offsets，按段调用 bytes.find，不必逐个访问 Python 字符串对象。
+    按下标取值时返回与原先一致的 {'code', 'name', 'aliases'} 字典。
+    """
+    ALIAS_SEP = "\x1f"
+
+    def __init__(self, codes=(), names=(), aliases=()):
+        self.codes = np.array(codes, dtype=str)
+        self.names = np.array(names, dtype=str)
+        self.aliases = np.empty(len(aliases), dtype=object)
+        self.aliases[:] = [tuple(a) for a in aliases]
+        # 逐个 str.lower()：小写后可能变长 (如 'İ')，np.char.lower 会按原宽度截断
+        self.names_lower = np.array([n.lower() for n in self.names.tolist()], dtype=str)
+        self.aliases_lower = np.array(
+            [self.ALIAS_SEP.join(str(a).lower() for a in group) for group in self.aliases], dtype=str
+        )
+        self._build_blob()
+
+    def _build_blob(self):
+        """拼接各股票的检索文本为一个字节串，offsets[i] 为第 i 段起点 (末尾多一项为总长度)"""
+        sep = self.ALIAS_SEP.encode()
+        parts = []
+        offsets = [0]
+        for code, name, group in zip(self.codes.tolist(), self.names_lower.tolist(), self.aliases_lower.tolist()):
+            texts = [code, name, group] if group else [code, name]
+            part = self.ALIAS_SEP.join(texts).encode() + sep  # 段尾分隔符，避免跨段匹配
+            parts.append(part)
+            offsets.append(offsets[-1] + len(part))
+        self.blob = b''.join(parts)
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return {'code': str(self.codes[i]), 'name': str(self.names[i]), 'aliases': list(self.aliases[i])}
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def contains(self, needle, i):
+        """第 i 只股票的代码、小写名称或小写简称是否包含 needle (UTF-8 编码的查询)"""
+        return self.blob.find(needle, self.offsets[i], self.offsets[i + 1]) >= 0
+
+
 class ExcelReader:
+    # 子串索引的最大 gram 长度：不超过该长度的查询直接取倒排表，更长的查询对其各个三元组的倒排表求交集
+    GRAM_SIZE = 3
+
     def __init__(self, data_dir="."):
+        """
+        Args:
+            data_dir: 数据文件所在目录 (数据延迟到首次查询或 load_in_background() 时加载)
+        """
         self.data_dir = data_dir
-        # stock_map: 用于根据代码和年份查找 URL -> key: "code_year", value: url
-        self.stock_map = {} 
-        # stock_db: 用于搜索建议，存储 [{'code': '...', 'name': '...'}, ...]
-        self.stock_db = []
-        # stock_years: 存储每个股票拥有的年份 -> key: code, value: set(years)
+        # stock_map: 用于根据代码和年份查找 URL -> key: (code, year), value: 去掉公共前缀 url_prefix 后的 url
+        self.stock_map = {}
+        # url_prefix: 所有链接的公共前缀 (如 "http://static.cninfo.com.cn/finalpage/20")，只保存一份
+        self.url_prefix = ""
+        # stock_db: 用于搜索建议，列式存储 (StockTable)，按下标取值得到 {'code': '...', 'name': '...', 'aliases': [...]}
+        self.stock_db = StockTable()
+        # stock_years: 存储每个股票拥有的年份 -> key: code, value: set(int 年份)
         self.stock_years = defaultdict(set)
-        
-        self._load_data()
+        # stock_years_str: 无法无损转为 int 的年份 (如 " 2015") -> key: code, value: set(原字符串)
+        self.stock_years_str = defaultdict(set)
+        # _years_by_code: 排好序的年份列表 -> key: code, value: [year, ...]
+        self._years_by_code = {}
+        # 前缀索引: 按 (代码, 下标) / (小写名称或简称, 下标) 排序，用于二分查找前缀
+        self._codes_sorted = []
+        self._names_sorted = []
+        # 子串索引: n-gram (n ≤ 3) -> 包含它的股票下标 (升序元组)
+        self._gram_index = {}
+        # 搜索结果缓存 (按实例)：key 为 (规范化后的 query, limit)，value 为命中的股票下标元组
+        self._search_cached = functools.lru_cache(maxsize=2048)(self._search)
+
+        # 构造时不加载数据 (解析数据文件可能耗时数秒)，首次查询或后台线程中加载，只加载一次
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load_in_background(self):
+        """在后台线程中开始加载数据，不阻塞调用方 (查询时若尚未加载完成会等待)"""
+        thread = threading.Thread(target=self.ensure_loaded, daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_loaded(self):
+        """确保数据已加载 (双重检查加锁；后台线程正在加载时等待其完成)"""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load_data()
+                    self._loaded = True
 
     def _load_data(self):
-        """加载 Excel/CSV 数据，建立索引和搜索库"""
-        # 定义要读取的文件名
-        files = [
-            "2001-2020.xlsx", "2021-2024.xlsx",
-            "2001-2020.xlsx - Sheet1.csv", "2021-2024.xlsx - Sheet1.csv"
-        ]
-        
+        """加载 Excel/CSV 数据，建立索引和搜索库 (数据文件未变化时直接读取合并缓存)"""
+        groups = self._source_groups()
+        if not self._load_cache(self._source_signature(groups)):
+            # 有数据集读取失败时不写缓存，下次启动重新解析；
+            # 解析 xlsx 会生成 Parquet 旁路文件，因此解析后重新计算签名
+            if self._parse_sources(groups):
+                self._save_cache(self._source_signature(self._source_groups()))
+
+        # 预先排序每只股票的年份并转为字符串，get_years 只需一次字典查找
+        self._years_by_code = {
+            code: [str(y) for y in sorted(self.stock_years.get(code, ()), reverse=True)]
+                  + self._sort_years(self.stock_years_str.get(code, ()))
+            for code in self.stock_years.keys() | self.stock_years_str.keys()
+        }
+        self._build_search_index()
+        # 数据重新加载后下标含义改变，清空搜索缓存
+        self._search_cached.cache_clear()
+        print(f"✅ ExcelReader 初始化完成: 加载了 {len(self.stock_db)} 只股票信息")
+
+    def _source_groups(self):
+        """
+        按数据集分组的候选文件 [(数据集名, [path, ...]), ...] (数据集按 DATA_FILES 顺序)
+
+        同一数据集的 xlsx、其导出的 CSV 与 Parquet 旁路文件内容相同，只需读取其一：
+        候选按解析速度排序 (Parquet > CSV > xlsx)，前一个读取失败时再尝试下一个。
+        Parquet 旁路文件早于 xlsx 时视为过期，不作为候选。
+        """
+        groups = {}
+        for f in DATA_FILES:
+            groups.setdefault(_DATASET_STEM_RE.sub('', f), []).append(os.path.join(self.data_dir, f))
+
+        rank = {'.parquet': 0, '.csv': 1, '.xlsx': 2}
+        result = []
+        for stem, paths in groups.items():
+            candidates = [p for p in paths if os.path.exists(p)]
+            for p in paths:
+                parquet_path = parquet_path_for(p) if p.endswith('.xlsx') else None
+                if parquet_path and os.path.exists(parquet_path) and (
+                    not os.path.exists(p) or os.path.getmtime(parquet_path) >= os.path.getmtime(p)
+                ):
+                    candidates.append(parquet_path)
+            if candidates:
+                candidates.sort(key=lambda p: rank[os.path.splitext(p)[1]])
+                result.append((stem, candidates))
+        return result
+
+    @staticmethod
+    def _source_signature(groups):
+        """候选文件的 (文件名, 大小, 修改时间) 列表，任一文件增删或变化都会使缓存失效"""
+        signature = []
+        for _, candidates in groups:
+            for path in sorted(candidates):
+                st = os.stat(path)
+                signature.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+        return signature
+
+    def _load_cache(self, signature):
+        """签名一致时从缓存恢复 stock_map / stock_years / stock_db，成功返回 True"""
+        cache_path = os.path.join(self.data_dir, CACHE_FILE)
+        if not signature or not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('version') != _CACHE_VERSION or cache.get('signature') != signature:
+                return False
+            self.stock_map = cache['stock_map']
+            self.url_prefix = cache['url_prefix']
+            self.stock_years = cache['stock_years']
+            self.stock_years_str = cache['stock_years_str']
+            self.stock_db = cache['stock_db']
+            return True
+        except Exception as e:
+            print(f"读取索引缓存失败 {cache_path}: {e}")
+            return False
+
+    def _save_cache(self, signature):
+        """写入合并缓存"""
+        if not signature:
+            return
+        cache_path = os.path.join(self.data_dir, CACHE_FILE)
+        cache = {
+            'version': _CACHE_VERSION,
+            'signature': signature,
+            'stock_map': self.stock_map,
+            'url_prefix': self.url_prefix,
+            'stock_years': self.stock_years,
+            'stock_years_str': self.stock_years_str,
+            'stock_db': self.stock_db,
+        }
+        try:
+            _atomic_write(cache_path, lambda f: pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"写入索引缓存失败 {cache_path}: {e}")
+
+    @staticmethod
+    def _dataset_fingerprint(candidates):
+        """数据集指纹：各候选文件的 (文件名, 大小, 修改时间) 与开头 64 KB 内容的 blake2b 摘要"""
+        h = hashlib.blake2b(str(_CACHE_VERSION).encode(), digest_size=16)
+        for path in sorted(candidates):
+            st = os.stat(path)
+            h.update(f"{os.path.basename(path)}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+            with open(path, 'rb') as f:
+                h.update(f.read(_FINGERPRINT_BYTES))
+        return h.hexdigest()
+
+    def _load_dataset_cache(self, fingerprint):
+        """读取单数据集缓存，返回 (实际读取的文件名, 解析结果)；不存在或损坏时返回 None"""
+        cache_path = os.path.join(self.data_dir, DATASET_CACHE_DIR, f"{fingerprint}.pkl")
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('version') != _CACHE_VERSION:
+                return None
+            return cache['result']
+        except Exception as e:
+            print(f"读取数据集缓存失败 {cache_path}: {e}")
+            return None
+
+    def _save_dataset_caches(self, results):
+        """写入新解析数据集的缓存 (results: 数据集名 -> 解析结果)，并删除已不对应任何数据集的旧缓存"""
+        cache_dir = os.path.join(self.data_dir, DATASET_CACHE_DIR)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except Exception as e:
+            print(f"创建数据集缓存目录失败 {cache_dir}: {e}")
+            return
+        # 解析 xlsx 会生成 Parquet 旁路文件，按解析后的候选文件计算指纹
+        current = set()
+        for stem, candidates in self._source_groups():
+            fingerprint = self._dataset_fingerprint(candidates)
+            current.add(f"{fingerprint}.pkl")
+            if stem not in results:
+                continue
+            cache_path = os.path.join(cache_dir, f"{fingerprint}.pkl")
+            cache = {'version': _CACHE_VERSION, 'result': results[stem]}
+            try:
+                _atomic_write(cache_path, lambda f: pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception as e:
+                print(f"写入数据集缓存失败 {cache_path}: {e}")
+        for name in os.listdir(cache_dir):
+            if _DATASET_CACHE_RE.fullmatch(name) and name not in current:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+    def _parse_sources(self, groups):
+        """解析各数据集，构建 stock_map / stock_years / stock_db；全部数据集读取成功时返回 True"""
+        ok = True
+        # 重新加载时从空表开始，避免保留已删除数据
+        self.stock_map = {}
+        self.stock_years = defaultdict(set)
+        self.stock_years_str = defaultdict(set)
         # 临时存储去重后的股票信息: code -> set(names)
         unique_stocks = defaultdict(set)
         # 最新年份显示名: code -> (year_int, name)
         latest_name = {}
 
-        for f in files:
-            path = os.path.join(self.data_dir, f)
-            if not os.path.exists(path):
+        for stem, result, cached in self._parse_files(groups):
+            if isinstance(result, Exception):
+                ok = False
+                print(f"Error loading {stem}: {result}")
                 continue
-                
-            try:
-                # 读取数据 (强制转为字符串，防止代码前导0丢失)
-                if f.endswith('.csv'):
-                    df = pd.read_csv(path, dtype=str)
-                else:
-                    df = pd.read_excel(path, dtype=str)
-                
-                # 清洗列名 (去除空格)
-                df.columns = [str(c).strip() for c in df.columns]
-                
-                # 智能识别列名
-                col_map = {}
-                for c in df.columns:
-                    if '代码' in c: col_map['code'] = c
-                    elif '简称' in c or '名称' in c: col_map['name'] = c
-                    elif '年份' in c: col_map['year'] = c
-                    elif '链接' in c or 'url' in c.lower(): col_map['url'] = c
-                
-                if 'code' in col_map and 'url' in col_map:
-                    for _, row in df.iterrows():
-                        # 处理代码
-                        raw_code = str(row[col_map['code']])
-                        if '.' in raw_code: raw_code = raw_code.split('.')[0]
-                        code = raw_code.zfill(6)
-                        
-                        # 处理年份
-                        raw_year = str(row[col_map['year']])
-                        if '.' in raw_year: raw_year = raw_year.split('.')[0]
-                        year = raw_year
-                        
-                        url = str(row[col_map['url']])
-                        
-                        # 处理名称
-                        name = code # 默认用代码
-                        if 'name' in col_map:
-                            name = str(row[col_map['name']]).strip()
-                        
-                        # 1. 构建 URL 映射
-                        key = f"{code}_{year}"
-                        self.stock_map[key] = url
-                        
-                        # 2. 记录该股票的年份
-                        if year and year.lower() != 'nan':
-                            self.stock_years[code].add(year)
-
-                        # 3. 构建搜索数据库 (去重，保留多个简称)
-                        if name and name.lower() != 'nan':
-                            unique_stocks[code].add(name)
-                            try:
-                                year_int = int(year)
-                            except:
-                                year_int = None
-                            if year_int is not None:
-                                prev = latest_name.get(code)
-                                if prev is None or year_int > prev[0]:
-                                    latest_name[code] = (year_int, name)
-                                
-            except Exception as e:
-                print(f"Error loading {f}: {e}")
+            name, parsed = result
+            if cached:
+                print(f"数据集 {stem}: 命中数据集缓存 (解析自 {name})")
+            else:
+                print(f"数据集 {stem}: 读取 {name}")
+            if parsed is None:
+                continue
+            map_items, year_items, stock_items, latest_items = parsed
+
+            # 1. 构建 URL 映射 (同一 key 以后出现的行为准)
+            self.stock_map.update(zip(*map_items))
 
-        # 将去重后的股票信息转为列表，供搜索使用
-        self.stock_db = []
+            # 2. 记录该股票的年份 (整数年份与其余字符串年份分开保存)
+            int_codes, int_years, str_codes, str_years = year_items
+            for code, y in zip(int_codes, int_years):
+                self.stock_years[code].add(y)
+            for code, y in zip(str_codes, str_years):
+                self.stock_years_str[code].add(y)
+
+            # 3. 构建搜索数据库 (去重，保留多个简称)
+            for code, n in zip(*stock_items):
+                unique_stocks[code].add(n)
+            for code, y, n in zip(*latest_items):
+                prev = latest_name.get(code)
+                if prev is None or y > prev[0]:
+                    latest_name[code] = (y, n)
+
+        # 链接几乎都来自同一站点，公共前缀只保存一份，stock_map 中只存其后的部分
+        self.url_prefix = os.path.commonprefix(list(self.stock_map.values()))
+        if self.url_prefix:
+            n = len(self.url_prefix)
+            self.stock_map = {key: url[n:] for key, url in self.stock_map.items()}
+
+        # 将去重后的股票信息转为列式表，供搜索使用
+        codes, display_names, alias_groups = [], [], []
         for code, names in unique_stocks.items():
             if not names:
                 display_name = code
@@ -104,43 +455,332 @@ class ExcelReader:
                     display_name = latest_name[code][1]
                 else:
                     display_name = aliases[0]
-            self.stock_db.append({'code': code, 'name': display_name, 'aliases': aliases})
-        print(f"✅ ExcelReader 初始化完成: 加载了 {len(self.stock_db)} 只股票信息")
+            codes.append(code)
+            display_names.append(display_name)
+            alias_groups.append(aliases)
+        self.stock_db = StockTable(codes, display_names, alias_groups)
+        return ok
+
+    def _parse_files(self, groups):
+        """
+        按数据集顺序逐个产出 (数据集名, (实际读取的文件名, 解析结果), 是否命中缓存)，候选文件全部失败时结果为异常对象
+
+        指纹未变化的数据集直接读取单数据集缓存，其余数据集解析后写入缓存
+        (数据集只有两个，从 Parquet/CSV 解析各需不到一秒，在当前进程中顺序解析；
+        进程池的启动与子进程导入开销反而更大)
+        """
+        fresh = {}
+        for stem, candidates in groups:
+            result = self._load_dataset_cache(self._dataset_fingerprint(candidates))
+            cached = result is not None
+            if not cached:
+                try:
+                    result = fresh[stem] = self._parse_dataset(candidates)
+                except Exception as e:
+                    result = e
+            yield stem, result, cached
+        if fresh:
+            self._save_dataset_caches(fresh)
+
+    @staticmethod
+    def _parse_dataset(candidates):
+        """
+        依次尝试同一数据集的候选文件，返回 (实际读取的文件名, 解析结果)；全部失败时抛出最后一个异常
+
+        (只保存文件名而非绝对路径：缓存随数据目录移动或挂载到其他路径后仍然有效)
+        """
+        error = None
+        for path in candidates:
+            try:
+                return os.path.basename(path), ExcelReader._parse_file(path)
+            except Exception as e:
+                print(f"Error loading {os.path.basename(path)}: {e}")
+                error = e
+        raise error
+
+    @staticmethod
+    def _parse_file(path):
+        """
+        读取并规范化单个数据文件，返回由列表组成的结果 (可直接 pickle 写入单数据集缓存)
+
+        Returns:
+            缺少代码/链接列时为 None；否则为
+            (map_items, year_items, stock_items, latest_items)：
+            ((code, year) 键, urls)、有效年份的 (codes, int 年份, codes, 其余年份字符串)、
+            去重后有效名称的 (codes, names)，
+            以及每只股票年份最大的行 (codes, year_ints, names) (同一年份取最先出现的行)
+        """
+        df = ExcelReader._read_table(path)
+
+        # 清洗列名 (去除空格)
+        df.columns = [str(c).strip() for c in df.columns]
+
+        # 智能识别列名
+        col_map = ExcelReader._map_columns(df.columns)
+        if 'code' not in col_map or 'url' not in col_map:
+            return None
+
+        rows = ExcelReader._normalize_rows(df, col_map)
+        year = rows['year']
+        has_year = (year != '') & (year.str.lower() != 'nan')
+        dated_rows = rows[has_year]
+        is_int_year = dated_rows['year'].str.fullmatch(_INT_YEAR_RE).to_numpy(dtype=bool)
+        int_rows, str_rows = dated_rows[is_int_year], dated_rows[~is_int_year]
+        name = rows['name']
+        named = rows[(name != '') & (name.str.lower() != 'nan')]
+        # 同一股票的简称大量重复，先去重，减少缓存体积与逐个合并的条目
+        named_pairs = named[['code', 'name']].drop_duplicates()
+
+        year_int = named['year'].map(ExcelReader._year_to_int)
+        dated = named[year_int.notna()].assign(year_int=year_int)
+        dated = dated.sort_values('year_int', ascending=False, kind='stable').drop_duplicates('code')
+
+        return (
+            (list(zip(rows['code'].tolist(), year.tolist())), rows['url'].tolist()),
+            (int_rows['code'].tolist(), [int(y) for y in int_rows['year']],
+             str_rows['code'].tolist(), str_rows['year'].tolist()),
+            (named_pairs['code'].tolist(), named_pairs['name'].tolist()),
+            (dated['code'].tolist(), [int(y) for y in dated['year_int']], dated['name'].tolist()),
+        )
+
+    @staticmethod
+    def _normalize_rows(df, col_map):
+        """
+        整列规范化代码/年份/链接/名称 (与逐行 str() 处理的结果一致，缺失值记为 'nan')
+
+        Returns:
+            DataFrame，列为 code / year / url / name
+        """
+        def text(col):
+            return df[col].fillna('nan').astype(str).astype(object)
+
+        code = ExcelReader._share_values(text(col_map['code']).str.split('.', n=1).str[0].str.zfill(6))
+        year = ExcelReader._share_values(text(col_map['year']).str.split('.', n=1).str[0])
+        name = text(col_map['name']).str.strip() if 'name' in col_map else code  # 默认用代码
+        return pd.DataFrame({
+            'code': code,
+            'year': year,
+            'url': text(col_map['url']),
+            'name': name,
+        })
+
+    @staticmethod
+    def _share_values(series):
+        """
+        相同取值共用同一个 str 对象 (factorize 去重后按编号回填)
+
+        代码/年份重复度极高，共用对象后 stock_map 等结构的键与缓存文件都只保存一份
+        (pickle 按对象去重)。不用 Categorical：其 tolist() 会为每行新建字符串。
+        """
+        codes, uniques = pd.factorize(series)
+        return pd.Series(np.asarray(uniques, dtype=object)[codes], index=series.index, dtype=object)
+
+    @staticmethod
+    def _year_to_int(year):
+        """年份字符串转 int，无法转换时返回 None"""
+        try:
+            return int(year)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _read_table(path):
+        """
+        读取单个数据文件 (Parquet / CSV / xlsx)
+
+        Parquet 为 xlsx 的旁路文件 (列式二进制，远快于解析 XML)；xlsx 解析后重新生成旁路文件。
+        (读取数据时强制转为字符串，防止代码前导0丢失)
+        """
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path)
+        if path.endswith('.csv'):
+            return ExcelReader._read_csv(path)
+        return convert_excel_to_parquet(path)
+
+    @staticmethod
+    def _detect_columns(path):
+        """
+        只读取 CSV 表头识别所需列，正式读取时解析器可直接跳过其余列
+
+        (xlsx 无法只解析部分列，由 convert_excel_to_parquet 读取一次后裁剪)
+
+        Returns:
+            (col_map, include)：col_map 为 _map_columns 的结果 (列名已去空格)，
+            include 为所需列的原始列名；未识别到任何列时为全部列名
+        """
+        with pa_csv.open_csv(path, parse_options=_CSV_PARSE_OPTIONS) as reader:
+            names = reader.schema.names
+        col_map = ExcelReader._map_columns([c.strip() for c in names])
+        wanted = set(col_map.values())
+        include = [c for c in names if c.strip() in wanted] or names
+        return col_map, include
+
+    @staticmethod
+    def _read_csv(path):
+        """
+        使用 Arrow 多线程 CSV 解析器读取所需列 (全部按字符串读取，防止代码前导0丢失)
+
+        缺失值规则与 pandas.read_csv(dtype=str) 一致，返回 pandas DataFrame
+        """
+        _, include = ExcelReader._detect_columns(path)
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=8 << 20),
+            parse_options=_CSV_PARSE_OPTIONS,
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=include,
+                column_types={c: pa.string() for c in include},
+                null_values=_CSV_NULL_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        return table.to_pandas()
+
+    @staticmethod
+    def _map_columns(columns):
+        """智能识别列名 -> {'code': ..., 'name': ..., 'year': ..., 'url': ...}"""
+        col_map = {}
+        for c in columns:
+            if '代码' in c: col_map['code'] = c
+            elif '简称' in c or '名称' in c: col_map['name'] = c
+            elif '年份' in c: col_map['year'] = c
+            elif '链接' in c or 'url' in c.lower(): col_map['url'] = c
+        return col_map
 
     def find_report_url(self, stock_code, year):
         """根据 6位代码 和 年份 查找 PDF 链接"""
-        key = f"{str(stock_code).zfill(6)}_{str(year)}"
-        return self.stock_map.get(key)
+        self.ensure_loaded()
+        suffix = self.stock_map.get((str(stock_code).zfill(6), str(year)))
+        return None if suffix is None else self.url_prefix + suffix
+
+    def find_report_urls(self, stock_codes, years):
+        """
+        批量查找 PDF 链接，结果与逐个调用 find_report_url 一致
+
+        Args:
+            stock_codes: 股票代码序列 (列表 / NumPy 数组等)
+            years: 与 stock_codes 等长的年份序列
+
+        Returns:
+            链接列表，未找到的位置为 None
+        """
+        self.ensure_loaded()
+        keys = zip([str(c).zfill(6) for c in stock_codes], [str(y) for y in years])
+        prefix = self.url_prefix
+        return [None if suffix is None else prefix + suffix for suffix in map(self.stock_map.get, keys)]
 
     def get_years(self, stock_code):
-        """获取指定股票代码的所有可用年份，并排序"""
+        """获取指定股票代码的所有可用年份 (已在加载时排序)"""
+        self.ensure_loaded()
         stock_code = str(stock_code).zfill(6)
-        years = list(self.stock_years.get(stock_code, []))
-        # 尝试转数字排序，如果失败则按字符串排序
-        try:
-            years.sort(key=lambda x: int(x), reverse=True) # 降序，最近的年份在前
-        except:
+        return list(self._years_by_code.get(stock_code, []))
+
+    @staticmethod
+    def _sort_years(years):
+        """年份排序：降序，最近的年份在前 (全部可转为 int 时按数值，否则按字符串)"""
+        years = list(years)
+        values = [ExcelReader._year_to_int(y) for y in years]
+        if None in values:
             years.sort(reverse=True)
-        return years
+            return years
+        order = sorted(range(len(years)), key=values.__getitem__, reverse=True)
+        return [years[i] for i in order]
+
+    def _build_search_index(self):
+        """构建前缀索引：代码与小写名称/简称各自排序，前缀查询可用二分定位命中区间"""
+        db = self.stock_db
+        self._codes_sorted = sorted(zip(db.codes.tolist(), range(len(db))))
+        names = set(zip(db.names_lower.tolist(), range(len(db))))
+        for i, group in enumerate(db.aliases_lower.tolist()):
+            if group:
+                names.update((alias, i) for alias in group.split(db.ALIAS_SEP))
+        self._names_sorted = sorted(names)
+        self._build_gram_index()
+
+    def _search_texts(self, i):
+        """参与子串匹配的文本：代码、小写名称与小写简称"""
+        db = self.stock_db
+        texts = [str(db.codes[i]), str(db.names_lower[i])]
+        if db.aliases_lower[i]:
+            texts.extend(str(db.aliases_lower[i]).split(db.ALIAS_SEP))
+        return texts
+
+    def _build_gram_index(self):
+        """构建 n-gram 倒排索引 (n = 1..GRAM_SIZE)，子串查询只需检查候选股票"""
+        index = defaultdict(list)
+        n = self.GRAM_SIZE
+        for i in range(len(self.stock_db)):
+            grams = set()
+            for text in self._search_texts(i):
+                for size in range(1, n + 1):
+                    grams.update(text[j:j + size] for j in range(len(text) - size + 1))
+            for gram in grams:
+                index[gram].append(i)  # 按下标顺序追加，倒排表天然升序
+        self._gram_index = {gram: tuple(ids) for gram, ids in index.items()}
+
+    def _substring_candidates(self, query):
+        """可能以子串形式包含 query 的股票下标 (升序)；query 长于 GRAM_SIZE 时调用方仍需校验"""
+        if not query:
+            return range(len(self.stock_db))
+        n = self.GRAM_SIZE
+        if len(query) <= n:
+            return self._gram_index.get(query, ())
+
+        postings = sorted(
+            (self._gram_index.get(query[j:j + n], ()) for j in range(len(query) - n + 1)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(ids)
+        return sorted(candidates)
+
+    @staticmethod
+    def _prefix_hits(sorted_keys, prefix):
+        """在 [(key, idx), ...] 有序列表中按前缀迭代命中的下标"""
+        pos = bisect.bisect_left(sorted_keys, (prefix,))
+        while pos < len(sorted_keys) and sorted_keys[pos][0].startswith(prefix):
+            yield sorted_keys[pos][1]
+            pos += 1
 
     def search_stocks(self, query, limit=10):
-        """模糊搜索股票"""
+        """
+        模糊搜索股票
+
+        先通过前缀索引取代码/名称以 query 开头的股票 (自动补全的常见情况)，
+        不足 limit 条时再按子串匹配补齐 (经 n-gram 倒排索引筛选候选)。结果按规范化后的 query 缓存。
+        """
         if not query:
             return []
             
         query = str(query).lower().strip()
-        results = []
-        
-        for stock in self.stock_db:
-            code = stock['code']
-            name = stock['name'].lower()
-            aliases = stock.get('aliases', [])
-            alias_hits = any(query in str(a).lower() for a in aliases)
-            
-            if query in code or query in name or alias_hits:
-                results.append(stock)
-                
-            if len(results) >= limit:
-                break
+        self.ensure_loaded()
+        # 缓存只保存下标，每次返回新建的字典，调用方修改结果不会污染缓存
+        return [self.stock_db[i] for i in self._search_cached(query, limit)]
+
+    def _search(self, query, limit):
+        """search_stocks 的实际查询逻辑，返回命中下标的 tuple 以便缓存"""
+        hits = []
+        seen = set()
+
+        for sorted_keys in (self._codes_sorted, self._names_sorted):
+            for i in self._prefix_hits(sorted_keys, query):
+                if len(hits) >= limit:
+                    break
+                if i not in seen:
+                    seen.add(i)
+                    hits.append(i)
+
+        if len(hits) < limit:
+            # 不超过 GRAM_SIZE 的查询本身就是 gram，倒排表即精确结果；更长的查询逐个校验候选，凑够 limit 即停止
+            verify = len(query) > self.GRAM_SIZE
+            needle = query.encode()
+            for i in self._substring_candidates(query):
+                if len(hits) >= limit:
+                    break
+                if i not in seen and (not verify or self.stock_db.contains(needle, i)):
+                    hits.append(i)
                 
-        return results
+        return tuple(hits)
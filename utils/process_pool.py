@@ -0,0 +1,24 @@
+import os
+import multiprocessing
+
+# 子进程启动方式：服务以 gunicorn gthread 多线程运行 (另有 ExcelReader 后台加载线程)，
+# 从多线程进程 fork 子进程可能死锁，改由单线程的 forkserver 进程派生 (不支持时使用 spawn)
+MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if MP_CONTEXT.get_start_method() == "forkserver":
+    # forkserver 预先导入任务所在模块 (pandas / pdfplumber 等)，新建的子进程无需重复导入
+    MP_CONTEXT.set_forkserver_preload(["core.pdf_parser"])
+
+
+def pool_workers(n_tasks):
+    """
+    进程池大小：CPU 在所有 gunicorn 工作进程的所有请求线程间均分，且不超过任务数
+
+    工作进程数/线程数取自 WEB_CONCURRENCY / GUNICORN_THREADS (gunicorn.conf.py 会写入实际值)，
+    未设置时 (直接运行脚本) 视为单进程单线程，可使用全部 CPU。
+    """
+    web_workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+    threads = int(os.environ.get("GUNICORN_THREADS") or 1)
+    share = (os.cpu_count() or 1) // max(1, web_workers * threads)
+    return max(1, min(share, n_tasks))
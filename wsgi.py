@@ -0,0 +1,7 @@
+from app import app, configure_logging, excel_reader, warm_up_page_pool
+
+# WSGI 入口 (部署时使用): gunicorn -c gunicorn.conf.py wsgi:app
+configure_logging()
+# 年报链接数据在后台线程中加载、PDF 解析进程池预先启动，均不阻塞工作进程启动
+excel_reader.load_in_background()
+warm_up_page_pool()